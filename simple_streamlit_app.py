@@ -18,16 +18,33 @@ Novedad de esta versión
 
 from __future__ import annotations
 
+import ast
+import concurrent.futures
+import functools
+import hashlib
+import importlib.util
 import io
+import json
 import os
 import re
+import shutil
 import sys
 import subprocess
+import threading
+import time
+import traceback
 import urllib.parse
 from datetime import date
+from pathlib import Path
+from types import ModuleType
 from typing import Any
 
+import numpy as np
 import pandas as pd
+import pyarrow as pa
+import pyarrow.compute as pc
+import pyarrow.csv as pa_csv
+import pyarrow.parquet as pq
 
 # ─────────────────────────────────────────────
 # 1. Dependencias
@@ -45,10 +62,17 @@ except ModuleNotFoundError:
 try:
     from slugify import slugify  # type: ignore
 except ModuleNotFoundError:
+    _SLUG_RE = re.compile(r"[^a-z0-9]+")
+    _FOLD = str.maketrans("áàâäéèêëíìîïóòôöúùûüñçÁÀÂÄÉÈÊËÍÌÎÏÓÒÔÖÚÙÛÜÑÇ", "aaaaeeeeiiiioooouuuuncaaaaeeeeiiiioooouuuunc")
+
     def slugify(txt: str) -> str:
-        return re.sub(r"[^a-z0-9]+", "-", txt.lower()).strip("-")
+        return _SLUG_RE.sub("-", txt.translate(_FOLD).lower()).strip("-")
+
+# La misma fila se vuelve a convertir en cada rerun mientras siga seleccionada
+slugify = functools.lru_cache(maxsize=256)(slugify)
 
 _cache = st.cache_data if hasattr(st, "cache_data") else st.cache
+_resource = st.cache_resource if hasattr(st, "cache_resource") else st.experimental_singleton
 
 # ─────────────────────────────────────────────
 # 2. Configuración global
@@ -61,21 +85,130 @@ APP_DIR = os.path.dirname(__file__)
 DL_DIR = os.path.join(APP_DIR, "descargas")
 os.makedirs(DL_DIR, exist_ok=True)
 
+# Copia local del catálogo ya parseado + validadores HTTP (ETag / Last-Modified)
+CATALOG_CACHE = os.path.join(DL_DIR, ".catalog.parquet")
+CATALOG_ETAG = os.path.join(DL_DIR, ".catalog.etag")
+
+# Caché en disco de las series descargadas (nombre = hash de la consulta)
+SERIES_CACHE_DIR = os.path.join(DL_DIR, ".cache")
+os.makedirs(SERIES_CACHE_DIR, exist_ok=True)
+SERIES_CACHE_MAX_AGE = 24 * 3600  # segundos; después se vuelve a pedir a la API
+
 # Carpeta para scripts asociados
 SCRIPTS_DIR = os.path.join(APP_DIR, "scripts_series")
 os.makedirs(SCRIPTS_DIR, exist_ok=True)
 
+# Orden de columnas en la vista (el resto va después, en el orden original)
+PREFERRED_ORDER = [
+    "consultas_90_dias",
+    "dataset_descripcion",
+    "dataset_fuente",
+    "dataset_tema",
+    "serie_indice_final",
+    "serie_indice_inicio",
+    "serie_unidades",
+    "serie_valor_ultimo",
+]
+
+# Filas por página en la tabla del catálogo
+PAGE_ROWS = 200
+
+# Descarga de series: tamaño de bloque de red y buffer de escritura a disco
+DOWNLOAD_CHUNK = 256 * 1024
+WRITE_BUFFER = 1 << 20
+
 _EMBEDDED_CSV = (
     "serie_id,serie_titulo,dataset_tema,dataset_descripcion,serie_descripcion,consultas_90_dias\n"
     "TEST123,Serie de ejemplo,Actividad,Dataset de prueba,Desc corta,999\n"
 )
 
+# Columnas de baja cardinalidad que se guardan como category
+CATEGORY_COLUMNS = ("dataset_tema", "dataset_fuente", "serie_unidades", "dataset_publicador_nombre")
+
+# Plantilla de los scripts asociados a cada serie (scripts_series/)
+_SCRIPT_TEMPLATE = '''# {script_name}
+# Script asociado a la serie '{serie_titulo}'
+# Creado el {today}
+
+"""
+¿Por qué necesito una ruta robusta en este contexto?
+- Permite calcular rutas relativas al script, sin depender del directorio de ejecución.
+- Usa os.path.dirname(__file__) para construir rutas siempre válidas.
+- Evita errores al mover la app o cambiar de máquina.
+"""
+
+# Ejemplos de rutas robustas:
+# base = os.path.splitext(os.path.basename(__file__))[0]
+# output_dir = os.path.join(os.path.dirname(__file__), 'series_transformadas')
+# os.makedirs(output_dir, exist_ok=True)
+
+"""
+¿Qué son los requisitos?
+- Son los requisitos necesarios para ejecutar este script.
+- Ejemplos: serie IPC actualizada, un archivo o recurso determinado.
+- SON OPCIONALES. Solo se mostrarán en la aplicación antes de que inicies la descarga.
+"""
+
+import os
+import sys
+import json
+
+
+def main(path):
+    # path: ruta del CSV recién guardado en descargas/
+    # Crear carpeta requisitos_script y JSON de requisitos vacío
+    base_dir = os.path.dirname(__file__)
+    requisitos_dir = os.path.join(base_dir, 'requisitos_script')
+    os.makedirs(requisitos_dir, exist_ok=True)
+
+    script_name = os.path.splitext(os.path.basename(__file__))[0]
+    json_path = os.path.join(requisitos_dir, f"{{script_name}}_requisitos.json")
+
+    requisitos_data = {{
+        'serie_titulo': "{serie_titulo}",
+        'requisitos': []
+    }}
+
+    with open(json_path, 'w', encoding='utf-8') as rf:
+        json.dump(requisitos_data, rf, ensure_ascii=False, indent=4)
+    # ------------------------------------------------------------------------------------------
+    # TODO: Agrega tus manipulaciones aquí
+    # ------------------------------------------------------------------------------------------
+
+
+if __name__ == "__main__":
+    main(sys.argv[1])
+'''
+
+# Tipos explícitos para el lector CSV de Arrow (el resto se infiere). Las fechas y
+# consultas_90_dias se leen como texto y se convierten después: un valor mal
+# formado queda nulo en lugar de abortar todo el parseo.
+_CATALOG_TYPES = {
+    "serie_id": pa.string(),
+    "serie_titulo": pa.string(),
+    "serie_descripcion": pa.string(),
+    "serie_unidades": pa.string(),
+    "serie_indice_inicio": pa.string(),
+    "serie_indice_final": pa.string(),
+    "dataset_titulo": pa.string(),
+    "dataset_descripcion": pa.string(),
+    "dataset_fuente": pa.string(),
+    "dataset_tema": pa.string(),
+    "consultas_90_dias": pa.string(),
+}
+_DATE_COLUMNS = ("serie_indice_inicio", "serie_indice_final")
+_NUMBER_RE = r"^\s*[-+]?\d+(\.\d+)?\s*$"
+
 st.set_page_config(page_title="Descarga series – datos.gob.ar", layout="wide")
 
 # ─────────────────────────────────────────────
 # Custom CSS
 # ─────────────────────────────────────────────
-st.markdown(
+# CSS compactado (menos bytes por rerun). Se inyecta en cada rerun porque Streamlit
+# descarta los elementos que un rerun no vuelve a emitir y el estilo se perdería.
+CUSTOM_CSS = re.sub(
+    r"\s+",
+    " ",
     """
     <style>
     ::-webkit-scrollbar { width: 12px; height: 12px; }
@@ -86,18 +219,17 @@ st.markdown(
         outline: 2px solid #ADD8E6 !important;
         background-color: rgba(173, 216, 230, 0.2) !important;
     }
-    .ag-cell-range-selected { border: 2px solid #ADD8E6 !important; }
-    .ag-range-selection .ag-selection-highlight { background-color: rgba(173, 216, 230, 0.3) !important; }
     </style>
     """,
-    unsafe_allow_html=True,
-)
+).strip()
+st.markdown(CUSTOM_CSS, unsafe_allow_html=True)
 
 st.title("Descargar series de tiempo de datos.gob.ar")
 
 # ─────────────────────────────────────────────
 # 3. Helpers
 # ─────────────────────────────────────────────
+@functools.lru_cache(maxsize=256)
 def build_api_url(serie_id: str, start: str | None = None, end: str | None = None) -> str:
     q: dict[str, Any] = {"ids": serie_id}
     if start:
@@ -106,100 +238,430 @@ def build_api_url(serie_id: str, start: str | None = None, end: str | None = Non
         q["end_date"] = end
     return API_BASE + urllib.parse.urlencode(q)
 
-@_cache(show_spinner="Descargando catálogo …")
+def _coerce_int32(col: pa.ChunkedArray) -> pa.ChunkedArray:
+    # Equivalente a pd.to_numeric(errors="coerce"): lo no numérico queda nulo
+    valid = pc.fill_null(pc.match_substring_regex(col, _NUMBER_RE), False)
+    numbers = pc.trunc(pc.cast(pc.if_else(valid, pc.utf8_trim_whitespace(col), None), pa.float64()))
+    # Fuera de rango de int32 también queda nulo (el cast seguro no debe desbordar)
+    in_range = pc.and_(pc.greater_equal(numbers, -(2**31)), pc.less_equal(numbers, 2**31 - 1))
+    return pc.cast(pc.if_else(in_range, numbers, None), pa.int32())
+
+
+def _coerce_dates(col: pa.ChunkedArray) -> pa.ChunkedArray:
+    # Solo la parte YYYY-MM-DD; fechas incompletas o inválidas quedan nulas
+    day = pc.utf8_slice_codeunits(col, 0, 10)
+    return pc.strptime(day, format="%Y-%m-%d", unit="ms", error_is_null=True)
+
+
+def _parse_catalog(csv_bytes: bytes) -> pd.DataFrame:
+    table = pa_csv.read_csv(
+        io.BytesIO(csv_bytes),
+        read_options=pa_csv.ReadOptions(use_threads=True, block_size=8 << 20),
+        # newlines_in_values: las descripciones entre comillas pueden tener saltos de línea
+        parse_options=pa_csv.ParseOptions(
+            newlines_in_values=True,
+            invalid_row_handler=lambda row: "skip",
+        ),
+        convert_options=pa_csv.ConvertOptions(
+            column_types=_CATALOG_TYPES,
+            null_values=[""],
+            strings_can_be_null=True,
+        ),
+    )
+    for c in _DATE_COLUMNS:
+        if c in table.column_names:
+            i = table.schema.get_field_index(c)
+            table = table.set_column(i, c, _coerce_dates(table.column(i)))
+    if "consultas_90_dias" in table.column_names:
+        i = table.schema.get_field_index("consultas_90_dias")
+        counts = pc.fill_null(_coerce_int32(table.column(i)), 0)
+        table = table.set_column(i, "consultas_90_dias", counts)
+    else:
+        table = table.append_column(
+            "consultas_90_dias", pa.repeat(pa.scalar(0, pa.int32()), table.num_rows)
+        )
+    return _table_to_frame(table)
+
+
+def _table_to_frame(table: pa.Table) -> pd.DataFrame:
+    """DataFrame respaldado por Arrow: ArrowDtype en todas las columnas salvo las category.
+
+    Se usa tanto para el CSV como para la copia Parquet, así ambos caminos dan
+    exactamente los mismos tipos y st.dataframe no tiene que convertir objetos.
+    """
+    # Las category vuelven del Parquet como diccionarios: se decodifican acá
+    for i, field in enumerate(table.schema):
+        if pa.types.is_dictionary(field.type):
+            table = table.set_column(i, field.name, table.column(i).cast(field.type.value_type))
+    df = table.replace_schema_metadata(None).to_pandas(types_mapper=pd.ArrowDtype)
+    for c in CATEGORY_COLUMNS:
+        if c in df.columns:
+            df[c] = df[c].astype("category")
+    return df
+
+
+def _read_cached_catalog() -> pd.DataFrame | None:
+    if not os.path.exists(CATALOG_CACHE):
+        return None
+    try:
+        return _table_to_frame(pq.read_table(CATALOG_CACHE))
+    except Exception:
+        return None
+
+
+def _catalog_validators() -> dict[str, str]:
+    """Cabeceras para el GET condicional (solo si hay copia local)."""
+    if not os.path.exists(CATALOG_CACHE):
+        return {}
+    try:
+        with open(CATALOG_ETAG, encoding="utf-8") as f:
+            saved = json.load(f)
+    except (OSError, ValueError):
+        return {}
+    headers: dict[str, str] = {}
+    if saved.get("etag"):
+        headers["If-None-Match"] = saved["etag"]
+    if saved.get("last_modified"):
+        headers["If-Modified-Since"] = saved["last_modified"]
+    return headers
+
+
+def _store_catalog(df: pd.DataFrame, r: Any) -> None:
+    tmp_path = CATALOG_CACHE + ".tmp"
+    df.to_parquet(tmp_path, index=False)
+    os.replace(tmp_path, CATALOG_CACHE)
+    with open(CATALOG_ETAG, "w", encoding="utf-8") as f:
+        json.dump(
+            {"etag": r.headers.get("ETag"), "last_modified": r.headers.get("Last-Modified")},
+            f,
+        )
+
+
+@_cache(show_spinner="Descargando catálogo …", ttl=3600)
 def load_catalog() -> pd.DataFrame:
     if requests is None:
+        cached = _read_cached_catalog()
+        if cached is not None:
+            return cached
         st.warning("No se encontró *requests*. Se usará el CSV embebido.")
-        csv_bytes = _EMBEDDED_CSV.encode()
-    else:
-        try:
+        return _parse_catalog(_EMBEDDED_CSV.encode())
+    try:
+        r = requests.get(CATALOG_URL, headers=_catalog_validators(), timeout=60)
+        if r.status_code == 304:
+            cached = _read_cached_catalog()
+            if cached is not None:
+                return cached
+            # Copia local ilegible: se pide el catálogo completo
             r = requests.get(CATALOG_URL, timeout=60)
-            r.raise_for_status()
-            csv_bytes = r.content
-        except Exception as e:
-            st.warning(f"Fallo descarga catálogo → {e}. Se usará versión mínima.")
-            csv_bytes = _EMBEDDED_CSV.encode()
-    df = pd.read_csv(io.BytesIO(csv_bytes), encoding="utf-8", on_bad_lines="skip", low_memory=False)
-    if "consultas_90_dias" not in df.columns:
-        df["consultas_90_dias"] = 0
-    df["consultas_90_dias"] = pd.to_numeric(df["consultas_90_dias"], errors="coerce").fillna(0)
+        r.raise_for_status()
+        df = _parse_catalog(r.content)
+    except Exception as e:
+        cached = _read_cached_catalog()
+        if cached is not None:
+            st.warning(f"Fallo descarga o lectura del catálogo → {e}. Se usará la copia local.")
+            return cached
+        st.warning(f"Fallo descarga o lectura del catálogo → {e}. Se usará versión mínima.")
+        return _parse_catalog(_EMBEDDED_CSV.encode())
+    try:
+        _store_catalog(df, r)
+    except Exception as e:
+        st.warning(f"No se pudo guardar la copia local del catálogo → {e}")
     return df
 
 
-def download_series(url: str) -> bytes:
+@_cache(show_spinner=False, ttl=3600)
+def prepare_catalog() -> tuple[pd.DataFrame, list[str], str]:
+    """Catálogo con las columnas reordenadas, lista de temas y clave de versión.
+
+    La clave identifica el contenido del catálogo y sirve para cachear los
+    derivados (títulos en minúsculas, órdenes) sin volver a hashear el DataFrame.
+    """
+    df = load_catalog()
+    topics = sorted(df["dataset_tema"].dropna().unique().tolist())
+    # dict.fromkeys: preferidas primero, resto en su orden, sin duplicados
+    col_set = set(df.columns)
+    col_order = dict.fromkeys(c for c in PREFERRED_ORDER if c in col_set)
+    col_order.update(dict.fromkeys(df.columns))
+    df = df[list(col_order)]
+    row_hashes = pd.util.hash_pandas_object(df, index=False).to_numpy()
+    catalog_key = hashlib.sha1(row_hashes.tobytes()).hexdigest()
+    return df, topics, catalog_key
+
+
+@_cache(show_spinner=False, ttl=3600)
+def fold_titles(_titles: pd.Series, catalog_key: str) -> pa.Array:
+    # Títulos en minúsculas, calculados una sola vez por catálogo
+    return pc.utf8_lower(pa.array(_titles))
+
+
+@_cache(show_spinner=False, ttl=3600, max_entries=64)
+def sort_order(_df: pd.DataFrame, catalog_key: str, col: str, asc: bool) -> tuple[np.ndarray, np.ndarray]:
+    """Posiciones de las filas ordenadas por *col* y el rango de cada fila en ese orden.
+
+    El rango permite ordenar un subconjunto de filas sin recorrer todo el catálogo.
+    """
+    ordered = _df[col].reset_index(drop=True).sort_values(ascending=asc, na_position="last")
+    order = ordered.index.to_numpy()
+    rank = np.empty_like(order)
+    rank[order] = np.arange(len(order))
+    return order, rank
+
+
+def title_mask(titles_lower: pa.Array, query: str) -> np.ndarray:
+    hits = pc.match_substring(titles_lower, query.lower())
+    return np.asarray(pc.fill_null(hits, False))
+
+
+def title_hits(titles_lower: pa.Array, catalog_key: str, query: str) -> np.ndarray:
+    """Posiciones de los títulos que contienen *query*.
+
+    Si la búsqueda extiende a la anterior (se siguió tipeando), solo se revisan
+    las coincidencias previas en lugar de todo el catálogo.
+    """
+    last = st.session_state.get("last_title_search")
+    if last is not None and last[0] == catalog_key and query == last[1]:
+        # Misma búsqueda (rerun por página, orden, fila…): nada que recalcular
+        return last[2]
+    if last is not None and last[0] == catalog_key and query.startswith(last[1]):
+        candidates = last[2]
+        hits = candidates[title_mask(titles_lower.take(candidates), query)]
+    else:
+        hits = np.flatnonzero(title_mask(titles_lower, query))
+    st.session_state["last_title_search"] = (catalog_key, query, hits)
+    return hits
+
+
+def series_cache_path(url: str) -> str:
+    # La URL codifica (serie_id, inicio, fin): misma consulta → mismo archivo
+    key = hashlib.blake2b(url.encode(), digest_size=16).hexdigest()
+    return os.path.join(SERIES_CACHE_DIR, key + ".csv")
+
+
+def _is_fresh(path: str) -> bool:
+    try:
+        info = os.stat(path)
+    except OSError:
+        return False
+    return info.st_size > 0 and time.time() - info.st_mtime < SERIES_CACHE_MAX_AGE
+
+
+def download_series(url: str, dest_path: str) -> str:
+    """Descarga la serie por bloques directo a *dest_path* y devuelve la ruta."""
     if requests is None:
         raise RuntimeError("Necesitas la librería *requests* para descargar las series.")
-    r = requests.get(url, timeout=60)
-    r.raise_for_status()
-    return r.content
+    # Temporal propio de cada hilo: la precarga puede correr en paralelo
+    tmp_path = f"{dest_path}.{threading.get_ident()}.tmp"
+    try:
+        with requests.get(url, stream=True, timeout=60) as r:
+            r.raise_for_status()
+            # Sin flush por bloque: el buffer grande agrupa las escrituras
+            with open(tmp_path, "wb", buffering=WRITE_BUFFER) as f:
+                for chunk in r.iter_content(chunk_size=DOWNLOAD_CHUNK):
+                    f.write(chunk)
+        os.replace(tmp_path, dest_path)
+    except BaseException:
+        # No dejar temporales huérfanos si la descarga falla a mitad de camino
+        try:
+            os.remove(tmp_path)
+        except FileNotFoundError:
+            pass
+        raise
+    return dest_path
+
+
+@_cache(show_spinner="Descargando serie …", ttl=3600, max_entries=32)
+def fetch_series(url: str) -> str:
+    path = series_cache_path(url)
+    if _is_fresh(path):
+        return path
+    return download_series(url, path)
+
+
+@_resource
+def _executor() -> concurrent.futures.ThreadPoolExecutor:
+    # Un único pool para todas las sesiones (sobrevive a los reruns)
+    return concurrent.futures.ThreadPoolExecutor(max_workers=4)
+
+
+def _forget_series(url: str) -> None:
+    """Descarta lo que la sesión guardó de *url* cuando la copia en disco venció."""
+    st.session_state.get("series_blob_cache", {}).pop(url, None)
+    futures = st.session_state.get("prefetch", {})
+    fut = futures.get(url)
+    if fut is not None and fut.done():
+        # Una precarga en curso se conserva: su archivo todavía no existe
+        del futures[url]
+
+
+def prefetch_series(url: str) -> None:
+    """Empieza a descargar la serie en segundo plano mientras se eligen las fechas."""
+    if _is_fresh(series_cache_path(url)):
+        return
+    _forget_series(url)
+    futures: dict[str, concurrent.futures.Future] = st.session_state.setdefault("prefetch", {})
+    if url not in futures:
+        futures[url] = _executor().submit(download_series, url, series_cache_path(url))
+
+
+def series_file(url: str) -> str:
+    """Ruta local de la serie; se descarga a lo sumo una vez por URL."""
+    fut = st.session_state.get("prefetch", {}).get(url)
+    if fut is not None:
+        try:
+            path = fut.result()
+        except Exception:
+            # Precarga fallida: se descarta y se descarga normalmente
+            del st.session_state["prefetch"][url]
+        else:
+            if _is_fresh(path):
+                return path
+            _forget_series(url)
+    path = fetch_series(url)
+    if not _is_fresh(path):
+        # La copia en caché fue borrada o venció: se vuelve a descargar en el mismo lugar
+        download_series(url, path)
+    return path
+
+
+def series_blob(url: str) -> bytes:
+    blobs: dict[str, bytes] = st.session_state.setdefault("series_blob_cache", {})
+    if url in blobs and not _is_fresh(series_cache_path(url)):
+        _forget_series(url)
+    if url not in blobs:
+        if len(blobs) >= 32:
+            blobs.pop(next(iter(blobs)))
+        blobs[url] = Path(series_file(url)).read_bytes()
+    return blobs[url]
+
+
+def ready_series_blob(url: str) -> bytes | None:
+    """Bytes de la serie solo si ya están disponibles sin ir a la red.
+
+    Los bytes en sesión y las precargas terminadas valen mientras la copia en
+    disco esté vigente (SERIES_CACHE_MAX_AGE); después se descartan.
+    """
+    if not _is_fresh(series_cache_path(url)):
+        _forget_series(url)
+        return None
+    return series_blob(url)
+
+
+def _defines_main(script_path: str) -> bool:
+    with open(script_path, encoding="utf-8") as f:
+        tree = ast.parse(f.read(), script_path)
+    return any(isinstance(node, ast.FunctionDef) and node.name == "main" for node in tree.body)
+
+
+def load_script_module(script_path: str) -> ModuleType | None:
+    """Importa el script asociado; se recarga solo si cambió en disco.
+
+    Devuelve None para scripts sin ``main(path)`` (plantilla anterior).
+    """
+    mods: dict[str, tuple[float, ModuleType | None]] = st.session_state.setdefault("_script_mods", {})
+    mtime = os.path.getmtime(script_path)
+    cached = mods.get(script_path)
+    if cached is not None and cached[0] == mtime:
+        return cached[1]
+    mod = None
+    if _defines_main(script_path):
+        name = os.path.splitext(os.path.basename(script_path))[0]
+        spec = importlib.util.spec_from_file_location(name, script_path)
+        mod = importlib.util.module_from_spec(spec)
+        spec.loader.exec_module(mod)
+    mods[script_path] = (mtime, mod)
+    return mod
+
+
+def run_series_script(script_path: str, file_path: str) -> str | None:
+    """Ejecuta ``main(file_path)`` del script; devuelve el error o None si terminó bien."""
+    try:
+        mod = load_script_module(script_path)
+        if mod is None:
+            # Scripts sin main(): se ejecutan como antes, en un proceso aparte
+            result = subprocess.run(
+                [sys.executable, script_path, file_path],
+                capture_output=True,
+                text=True
+            )
+            return None if result.returncode == 0 else result.stderr
+        mod.main(file_path)
+    except SystemExit as e:
+        if e.code not in (None, 0):
+            return traceback.format_exc()
+    except Exception:
+        return traceback.format_exc()
+    return None
 
 # ─────────────────────────────────────────────
 # 4. Filtros y orden
 # ─────────────────────────────────────────────
-meta = load_catalog()
+meta, all_topics, catalog_key = prepare_catalog()
 
 st.sidebar.header("Filtros globales")
-all_topics = sorted(meta["dataset_tema"].dropna().unique())
 sel_topic = st.sidebar.selectbox("Tema", ["Todos"] + all_topics)
-filtered = meta if sel_topic == "Todos" else meta[meta["dataset_tema"] == sel_topic]
-
 query = st.sidebar.text_input("🔍 Buscar en título")
-if query:
-    filtered = filtered[filtered["serie_titulo"].str.contains(query, case=False, na=False)]
-cols_for_sort = list(filtered.columns)
+
+cols_for_sort = list(meta.columns)
 order_col = st.sidebar.selectbox(
     "Ordenar por",
     cols_for_sort,
     index=cols_for_sort.index("consultas_90_dias") if "consultas_90_dias" in cols_for_sort else 0,
 )
 asc = st.sidebar.checkbox("Ascendente", value=False)
-filtered = filtered.sort_values(order_col, ascending=asc, na_position="last")
+# El orden se calcula una vez por (columna, sentido); el filtro solo lo recorta
+order, rank = sort_order(meta, catalog_key, order_col, asc)
+if query:
+    # Con búsqueda se trabaja solo sobre las coincidencias, no sobre todo el catálogo
+    rows = title_hits(fold_titles(meta["serie_titulo"], catalog_key), catalog_key, query)
+    if sel_topic != "Todos":
+        rows = rows[(meta["dataset_tema"].take(rows) == sel_topic).to_numpy(dtype=bool, na_value=False)]
+    rows = rows[np.argsort(rank[rows], kind="stable")]
+elif sel_topic != "Todos":
+    topic_mask = (meta["dataset_tema"] == sel_topic).to_numpy(dtype=bool, na_value=False)
+    rows = order[topic_mask[order]]
+else:
+    rows = order
+filtered = meta.take(rows)
 
 # ─────────────────────────────────────────────
-# 5. Reordenar columnas para la vista
+# 5. Mostrar tabla paginada
 # ─────────────────────────────────────────────
-preferred_order = [
-    "consultas_90_dias",
-    "dataset_descripcion",
-    "dataset_fuente",
-    "dataset_tema",
-    "serie_indice_final",
-    "serie_indice_inicio",
-    "serie_unidades",
-    "serie_valor_ultimo",
-]
-existing_preferred = [c for c in preferred_order if c in filtered.columns]
-remaining_cols = [c for c in filtered.columns if c not in existing_preferred]
-filtered = filtered[existing_preferred + remaining_cols]
+# Solo se envía al navegador la página visible, no el catálogo entero
+n_pages = max(1, -(-len(filtered) // PAGE_ROWS))
+page = int(st.sidebar.number_input("Página", min_value=1, max_value=n_pages, value=1, step=1))
+page_df = filtered.iloc[(page - 1) * PAGE_ROWS : page * PAGE_ROWS]
 
-# ─────────────────────────────────────────────
-# 6. Mostrar tabla completa
-# ─────────────────────────────────────────────
 st.subheader(f"Catálogo filtrado ({len(filtered)} series)")
-st.dataframe(filtered, use_container_width=True, height=600)
+st.dataframe(page_df, use_container_width=True, height=600)
+st.caption(f"Página {page} de {n_pages} · {PAGE_ROWS} filas por página")
 
 # ─────────────────────────────────────────────
-# 7. Descarga de series
+# 6. Descarga de series
 # ─────────────────────────────────────────────
 st.sidebar.markdown("---")
 st.sidebar.header("Descarga de series")
 
-fila_labels = ["— Elige una —"] + [str(idx) for idx in filtered.index]
-sel_fila = st.sidebar.selectbox("Número de fila", fila_labels)
-st.sidebar.caption("Typea o selecciona la fila")
+# Solo se ofrecen las filas de la página visible
+sel_fila = st.sidebar.selectbox(
+    "Número de fila",
+    [None] + page_df.index.tolist(),
+    format_func=lambda idx: "— Elige una —" if idx is None else str(idx),
+)
+st.sidebar.caption("Typea o selecciona la fila (de la página visible)")
 
 start_date = st.sidebar.text_input("Fecha inicio", "", autocomplete="off")
 end_date = st.sidebar.text_input("Fecha fin", "", autocomplete="off")
 st.sidebar.caption("Formato de fecha: YYYY-MM-DD")
 
-if sel_fila != "— Elige una —":
-    idx = int(sel_fila)
-    serie_row = filtered.loc[idx]
+if sel_fila is not None:
+    serie_row = page_df.loc[sel_fila]
     sel_id = serie_row["serie_id"]
     start = start_date.strip() or None
     end = end_date.strip() or None
     api_url = build_api_url(sel_id, start=start, end=end)
     base_slug = slugify(serie_row.serie_titulo)
+    # La serie completa se precarga apenas se elige la fila; se usa si no hay fechas
+    prefetch_series(build_api_url(sel_id))
     if start or end:
         parts: list[str] = []
         if start:
@@ -213,81 +675,52 @@ if sel_fila != "— Elige una —":
 
     if st.sidebar.button("💾 Guardar en servidor"):
         try:
-            content = download_series(api_url)
             file_path = os.path.join(DL_DIR, fname)
-            with open(file_path, "wb") as f:
-                f.write(content)
+            shutil.copyfile(series_file(api_url), file_path)
             st.sidebar.success(f"✅ Guardado en servidor: descargas/{fname}")
 
             script_name = f"{base_slug}.py"
             script_path = os.path.join(SCRIPTS_DIR, script_name)
             if not os.path.exists(script_path):
-                with open(script_path, "w", encoding="utf-8") as sf:
-                    sf.write(f"# {script_name}\n")
-                    sf.write(f"# Script asociado a la serie '{serie_row.serie_titulo}'\n")
-                    sf.write(f"# Creado el {date.today().isoformat()}\n\n")
-                    sf.write('"""\n')
-                    sf.write("¿Por qué necesito una ruta robusta en este contexto?\n")
-                    sf.write("- Permite calcular rutas relativas al script, sin depender del directorio de ejecución.\n")
-                    sf.write("- Usa os.path.dirname(__file__) para construir rutas siempre válidas.\n")
-                    sf.write("- Evita errores al mover la app o cambiar de máquina.\n")
-                    sf.write('"""\n\n')
-                    sf.write("# Ejemplos de rutas robustas:\n")
-                    sf.write("# base = os.path.splitext(os.path.basename(__file__))[0]\n")
-                    sf.write("# output_dir = os.path.join(os.path.dirname(__file__), 'series_transformadas')\n")
-                    sf.write("# os.makedirs(output_dir, exist_ok=True)\n")
-                    sf.write("\n")
-                    sf.write('"""\n')
-                    sf.write("¿Qué son los requisitos?\n")
-                    sf.write("- Son los requisitos necesarios para ejecutar este script.\n")
-                    sf.write("- Ejemplos: serie IPC actualizada, un archivo o recurso determinado.\n")
-                    sf.write("- SON OPCIONALES. Solo se mostrarán en la aplicación antes de que inicies la descarga.\n")
-                    sf.write('"""\n\n')
-                    sf.write("import os\n")
-                    sf.write("import json\n\n")
-                    sf.write("# Crear carpeta requisitos_script y JSON de requisitos vacío\n")
-                    sf.write("base_dir = os.path.dirname(__file__)\n")
-                    sf.write("requisitos_dir = os.path.join(base_dir, 'requisitos_script')\n")
-                    sf.write("os.makedirs(requisitos_dir, exist_ok=True)\n\n")
-                    sf.write("script_name = os.path.splitext(os.path.basename(__file__))[0]\n")
-                    sf.write("json_path = os.path.join(requisitos_dir, f\"{script_name}_requisitos.json\")\n\n")
-                    sf.write("requisitos_data = {\n")
-                    sf.write(f"    'serie_titulo': \"{serie_row.serie_titulo}\",\n")
-                    sf.write("    'requisitos': []\n")
-                    sf.write("}\n\n")
-                    sf.write("with open(json_path, 'w', encoding='utf-8') as rf:\n")
-                    sf.write("    json.dump(requisitos_data, rf, ensure_ascii=False, indent=4)\n")
-                    sf.write("# ----------------------------------------------------------------------------------------------\n")
-                    sf.write("# TODO: Agrega tus manipulaciones aquí\n")
-                    sf.write("# ----------------------------------------------------------------------------------------------")
+                script_code = _SCRIPT_TEMPLATE.format(
+                    script_name=script_name,
+                    serie_titulo=serie_row.serie_titulo,
+                    today=date.today().isoformat(),
+                )
+                # Escritura atómica: un solo write y rename
+                tmp_script = script_path + ".tmp"
+                Path(tmp_script).write_text(script_code, encoding="utf-8")
+                os.replace(tmp_script, script_path)
                 st.sidebar.success(f"✅ Script creado: scripts_series/{script_name}")
 
-            result = subprocess.run(
-                [sys.executable, script_path, file_path],
-                capture_output=True,
-                text=True
-            )
-            if result.returncode == 0:
+            script_error = run_series_script(script_path, file_path)
+            if script_error is None:
                 st.sidebar.success("✅ Script ejecutado correctamente")
             else:
-                st.sidebar.error(f"⚠️ Error al ejecutar script:\n{result.stderr}")
+                st.sidebar.error(f"⚠️ Error al ejecutar script:\n{script_error}")
         except Exception as e:
             st.sidebar.error(f"Error al guardar o ejecutar en servidor: {e}")
 
     try:
-        st.sidebar.download_button(
-            label=f"⬇️ Descargar en local: {fname}",
-            data=download_series(api_url),
-            file_name=fname,
-            mime="text/csv",
-        )
+        # El botón solo aparece con la serie ya disponible (guardada o precargada);
+        # si no, se pide explícitamente para no descargar en cada rerun
+        blob = ready_series_blob(api_url)
+        if blob is None and st.sidebar.button("📦 Preparar descarga"):
+            blob = series_blob(api_url)
+        if blob is not None:
+            st.sidebar.download_button(
+                label=f"⬇️ Descargar en local: {fname}",
+                data=blob,
+                file_name=fname,
+                mime="text/csv",
+            )
     except Exception as e:
         st.sidebar.error(f"Error en descarga local: {e}")
 else:
     st.sidebar.info("Selecciona una fila para activar las opciones de descarga.")
 
 # ─────────────────────────────────────────────
-# 8. CLI tests
+# 7. CLI tests
 # ─────────────────────────────────────────────
 if __name__ == "__main__":
     assert build_api_url("ABC").endswith("ids=ABC")